@@ -15,10 +15,12 @@ if not SECRET_KEY:
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 12 * 60
+# Test runs set HRM_FAST_HASH: bcrypt's minimum cost keeps register/login cheap there
+BCRYPT_ROUNDS = 4 if os.getenv("HRM_FAST_HASH") == "1" else 12
 
 def hash_password(password: str) -> str:
     # Hash a plaintext password using bcrypt.
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     # Verify a plaintext password against a hashed password.
@@ -23,15 +23,19 @@ except locale.Error:
     except locale.Error:
         pass  # Use system default
 
+from sqlalchemy import exists, select
 from sqlalchemy.orm import Session
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from contextlib import asynccontextmanager
+from functools import wraps
 from datetime import datetime, timedelta, timezone
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
-from db import get_db, engine, SessionLocal
-from models import User, Employee, Base, Attendance
+from db import get_db, engine, SessionLocal, job_lock
+from models import User, Employee, Base, Attendance, LeaveCoin
 from schemas import UserCreate, UserOut, Token, EmployeeCreate, LeaveBalanceOut
 from auth import hash_password, verify_password, create_access_token
 from dependencies import get_current_user, allow_admin
@@ -39,48 +43,85 @@ from router import employees, attendance, leave, attendance_rt, inspiration
 from router import leave_coin as leave_coins_router
 from router import posts, admin_posts
 from services.leave_coins import grant_coins, expire_coins
+from services.timezone_utils import utc_now, utc_to_ist, ist_to_utc
 from dependencies import router as dependencies_router
 from services.scheduler import quote_scheduler
 
 
 
-scheduler = BackgroundScheduler(timezone="Asia/Kolkata")
+# Never stack overlapping runs; after downtime run a missed job once (within an hour), not a backlog
+JOB_DEFAULTS = {"coalesce": True, "max_instances": 1, "misfire_grace_time": 3600}
+scheduler = BackgroundScheduler(timezone="Asia/Kolkata", job_defaults=JOB_DEFAULTS)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("scheduler")
 
+def single_worker(job):
+    """Every app worker runs this scheduler; let only the one holding the job's DB lock do the work"""
+    @wraps(job)
+    def run():
+        with job_lock(f"hrm:{job.__name__}") as acquired:
+            if not acquired:
+                logger.info("%s already running in another worker, skipped", job.__name__)
+                return
+            return job()
+    return run
+
+ATTENDANCE_PURGE_BATCH = 5000
+
+@single_worker
 def remove_old_attendance():
     db = SessionLocal()
     try:
-        threshold = datetime.now(timezone.utc) - timedelta(days=30)
-        db.query(Attendance).filter(Attendance.login_time < threshold).delete()
-        db.commit()
+        # login_time is stored as naive UTC; compare like with like
+        threshold = utc_now() - timedelta(days=30)
+        # Delete in bounded batches (TOP/LIMIT id subquery) to keep each transaction's locks short
+        while True:
+            batch = select(Attendance.id).where(Attendance.login_time < threshold).limit(ATTENDANCE_PURGE_BATCH)
+            deleted = db.query(Attendance).filter(Attendance.id.in_(batch)).delete(synchronize_session=False)
+            db.commit()
+            if deleted < ATTENDANCE_PURGE_BATCH:
+                break
     finally:
         db.close()
 
+@single_worker
 def grant_monthly_coins():
     db = SessionLocal()
     try:
-        employees = db.query(Employee).all()
+        # One timestamp for the whole run: same grant/expiry dates for everyone
+        now = datetime.now(timezone.utc)
+        # The job lock only stops overlapping runs; a restart, misfire catch-up or a
+        # second worker acquiring the lock later must not grant the same month twice.
+        # The month is the scheduler's (IST) month, kept as naive UTC like grant_date.
+        month_start = ist_to_utc(utc_to_ist(now).replace(day=1, hour=0, minute=0, second=0, microsecond=0))
+        granted_this_month = exists().where(
+            LeaveCoin.employee_id == Employee.id,
+            LeaveCoin.source == "monthly_grant",
+            LeaveCoin.grant_date >= month_start,
+        )
+        # Only the id is needed; avatar_url can hold a whole base64 image
+        employee_ids = [row.id for row in db.query(Employee.id).filter(~granted_this_month).all()]
         total_granted = 0
-        for e in employees:
-            total_granted += grant_coins(db, e.id, amount=1, source="monthly_grant")
+        for employee_id in employee_ids:
+            total_granted += grant_coins(db, employee_id, amount=1, source="monthly_grant", now=now)
         db.commit()
-        logging.getLogger("scheduler").info(f"Monthly grant done. total_granted={total_granted}")
+        logger.info("Monthly grant done. total_granted=%s", total_granted)
     except Exception as ex:
         db.rollback()
-        logging.getLogger("scheduler").exception("Monthly grant failed: %s", ex)
+        logger.exception("Monthly grant failed: %s", ex)
     finally:
         db.close()
 
+@single_worker
 def expire_old_coins():
     db = SessionLocal()
     try:
         total = expire_coins(db)
         db.commit()
-        logging.getLogger("scheduler").info(f"Expired coins run done. total_expired={total}")
+        logger.info("Expired coins run done. total_expired=%s", total)
     except Exception as ex:
         db.rollback()
-        logging.getLogger("scheduler").exception("Expire coins failed: %s", ex)
+        logger.exception("Expire coins failed: %s", ex)
     finally:
         db.close()
 
@@ -90,27 +131,26 @@ async def lifespan(app: FastAPI):
     scheduler.add_job(remove_old_attendance, "interval", days=1)
     scheduler.add_job(grant_monthly_coins, CronTrigger(day="1", hour=0, minute=0))
     scheduler.add_job(expire_old_coins, "interval", days=1)
-    
-    # daily quote featch
-    def fetch_daily_quote_job():
-        db = SessionLocal()
-        try:
-            from services.quotes import fetch_and_store_quote
-            fetch_and_store_quote(db)
-            db.commit()
-        except Exception:
-            db.rollback()
-        finally:
-            db.close()
-    # This runs 5 minutes after 00:00 IST daily 
-    scheduler.add_job(fetch_daily_quote_job, CronTrigger(hour=0, minute=5))
-    
+
+    # Handlers write from a listener thread; jobs and request handlers only enqueue
+    # records. Set up here (not at import) so importing main leaves logging alone.
+    root_handlers = logging.root.handlers[:]
+    log_listener = QueueListener(queue.SimpleQueue(), *root_handlers, respect_handler_level=True)
+    logging.root.handlers = [QueueHandler(log_listener.queue)]
+    log_listener.start()
+
     scheduler.start()
+    # daily quote fetch (00:01 UTC, the DailyQuote day boundary) + 12:01 UTC backup
+    quote_scheduler.start()
     try:
         yield
     finally:
         # shutdown
+        quote_scheduler.stop()
         scheduler.shutdown()
+        # after the schedulers, so their shutdown records are still written
+        log_listener.stop()
+        logging.root.handlers = root_handlers
 
 # ✅ ENHANCED FASTAPI CONFIGURATION
 app = FastAPI(
@@ -213,9 +253,10 @@ def dev_grant_now(db: Session = Depends(get_db), current_user: User = Depends(ge
         raise HTTPException(status_code=403, detail="Not permitted")
     from models import Employee
     from services.leave_coins import grant_coins
+    now = datetime.now(timezone.utc)
     total = 0
-    for e in db.query(Employee).all():
-        total += grant_coins(db, e.id, 1, "manual_dev_grant")
+    for (employee_id,) in db.query(Employee.id).all():
+        total += grant_coins(db, employee_id, 1, "manual_dev_grant", now=now)
     db.commit()
     return {"granted": total}
 
@@ -296,7 +337,7 @@ def get_leave_balance_me(db: Session = Depends(get_db), current_user: User = Dep
         raise HTTPException(status_code=404, detail="Employee profile not found")
     
     # Get balance data
-    balance_data = get_available_coins(db, emp.id)
+    balance_data = get_available_coins(db, emp.id, use_cache=True)
     return LeaveBalanceOut(**balance_data)
 
 
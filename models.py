@@ -12,10 +12,11 @@ from sqlalchemy import (
     UniqueConstraint,
     Unicode,
     func,
+    text,
     )
 from sqlalchemy.orm import relationship, DeclarativeBase
 from sqlalchemy.ext.declarative import declarative_base
-from datetime import datetime, timezone
+from services.timezone_utils import utc_now
 
 # TIMEZONE ARCHITECTURE NOTES:
 # =================================
@@ -51,7 +52,7 @@ class Attendance(Base):
     __tablename__ = 'attendance'
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(Integer, ForeignKey('employees.id'))
-    login_time = Column(DateTime)
+    login_time = Column(DateTime, index=True)  # 30-day purge job filters on this
     logout_time = Column(DateTime)
     on_leave = Column(Boolean, default=False)
     work_hours = Column(Float)
@@ -66,6 +67,11 @@ class WorkSession(Base):
     total_work_seconds = Column(Integer, nullable=False, default=0)
     employee = relationship("Employee")
 
+    __table_args__ = (
+        # recent/timesheet/today-completed all filter employee_id + clock_in_time range
+        Index("ix_work_sessions_employee_clock_in", "employee_id", "clock_in_time"),
+    )
+
 class BreakInterval(Base):
     __tablename__ = "break_intervals"
     id = Column(Integer, primary_key=True, index=True)
@@ -122,11 +128,24 @@ class LeaveCoin(Base):
     quantity = Column(Integer, nullable=False, default=1)
     remaining = Column(Integer, nullable=False, default=1)
     source = Column(String, nullable=False, default="monthly_grant")
-    created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, nullable=False, default=utc_now)
     employee = relationship("Employee")
     
     __table_args__ = (
-        Index("ix_leave_coins_employee_expiry", "employee_id", "expiry_date"),
+        # Filtered index for the balance/consume queries (they all keep `remaining > 0`);
+        # replaces the unfiltered (employee_id, expiry_date) index. INCLUDE makes it
+        # covering for the balance sums, so they never touch the table.
+        Index(
+            "ix_leave_coins_active",
+            "employee_id",
+            "expiry_date",
+            mssql_include=["remaining", "grant_date"],
+            postgresql_include=["remaining", "grant_date"],
+            mssql_where=text("remaining > 0"),
+            postgresql_where=text("remaining > 0"),
+            sqlite_where=text("remaining > 0"),
+        ),
+        Index("ix_leave_coins_employee_grant", "employee_id", "grant_date"),
     )
 
 
@@ -138,7 +157,7 @@ class LeaveCoinTxn(Base):
     type = Column(String, nullable=False)  # "grant" | "consume" | "expire" | "adjust" | "restore"
     amount = Column(Integer, nullable=False)
     ref_leave_request_id = Column(Integer, ForeignKey("leave_requests.id"), nullable=True)
-    occurred_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    occurred_at = Column(DateTime, nullable=False, default=utc_now)
     comment = Column(String, nullable=True)
     employee = relationship("Employee")
     coin = relationship("LeaveCoin")
@@ -152,8 +171,8 @@ class Post(Base):
     title = Column(Unicode(255), nullable=False)
     content = Column(Unicode, nullable=False)  # Using String instead of Text for MSSQL compatibility
     author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=utc_now)
+    updated_at = Column(DateTime, default=utc_now)
     is_pinned = Column(Boolean, default=False)
     status = Column(String(20), default="published")
     
@@ -169,7 +188,7 @@ class PostReaction(Base):
     post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     emoji = Column(Unicode(20), nullable=False)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=utc_now)
     
     # Relationships
     post = relationship("Post", back_populates="reactions")
@@ -186,7 +205,7 @@ class PostView(Base):
     id = Column(Integer, primary_key=True, index=True)
     post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    viewed_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    viewed_at = Column(DateTime, default=utc_now)
     
     # Relationships
     post = relationship("Post", back_populates="views")
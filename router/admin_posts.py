@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session, joinedload
 from typing import List
+from collections import defaultdict
 from datetime import datetime, timezone
 
 from services.timezone_utils import format_ist_datetime
@@ -68,15 +69,13 @@ def get_all_posts_admin(
     result = []
     for post in posts:
         
-        reaction_counts = {}
+        reaction_counts = defaultdict(int)
         reactions_detail = []
         
         for reaction in post.reactions:
             emoji = reaction.emoji if reaction.emoji else "👍"
             
             # Count reactions
-            if emoji not in reaction_counts:
-                reaction_counts[emoji] = 0
             reaction_counts[emoji] += 1
             
             
@@ -103,7 +102,7 @@ def get_all_posts_admin(
             updated_at=format_ist_datetime(post.updated_at),
             is_pinned=post.is_pinned,
             status=post.status,
-            reaction_counts=reaction_counts,
+            reaction_counts=dict(reaction_counts),
             reactions=reactions_detail,
             total_reactions=total_reactions,
             view_count=view_count
@@ -6,7 +6,7 @@ from db import get_db
 from dependencies import get_current_user, allow_employee, allow_admin
 from typing import List
 from zoneinfo import ZoneInfo
-from utils import ensure_utc_naive
+from services.timezone_utils import ensure_utc_naive
 
 # from datetime import timezone
 # import pytz
@@ -1,27 +1,29 @@
 # router\attendance_rt.py
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone, timedelta
 from db import get_db
 from dependencies import get_current_user, allow_admin
 from models import Employee, User, WorkSession
 from services.attendance_rt import *
-from services.timezone_utils import format_ist_time_12h
+from services.attendance_rt import sum_breaks_by_session
+from services.timezone_utils import format_ist_time_12h, utc_now
 from zoneinfo import ZoneInfo
-from schemas import WorkSessionStateOut, WorkSessionDayRow, ClockActionResponse
+from schemas import WorkSessionStateOut, WorkSessionDayRow, ClockActionResponse, ClockBatchAction
 
 router = APIRouter(prefix="/attendance-rt", tags=["Attendance RT"])
 
 @router.get("/active", response_model=WorkSessionStateOut)
 def get_active(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    emp = require_employee_for_user(db, current_user.id)
-    data = session_state(db, emp.id)
+    employee_id = employee_id_for_user(db, current_user.id)
+    data = session_state(db, employee_id)
     return WorkSessionStateOut(**data)
 
 @router.post("/clock-in", response_model=ClockActionResponse)
 def post_clock_in(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    emp = require_employee_for_user(db, current_user.id)
-    ws = clock_in(db, emp.id)
+    employee_id = employee_id_for_user(db, current_user.id)
+    ws = clock_in(db, employee_id)
     return ClockActionResponse(
         session_id=ws.id, 
         status=ws.status, 
@@ -30,9 +32,9 @@ def post_clock_in(db: Session = Depends(get_db), current_user: User = Depends(ge
 
 @router.post("/start-break", response_model=ClockActionResponse)
 def post_start_break(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    emp = require_employee_for_user(db, current_user.id)
+    employee_id = employee_id_for_user(db, current_user.id)
     try:
-        ws = start_break(db, emp.id)
+        ws = start_break(db, employee_id)
         db.commit()
         return ClockActionResponse(session_id=ws.id, status=ws.status, message="Break started")
     except RuntimeError as e:
@@ -40,9 +42,9 @@ def post_start_break(db: Session = Depends(get_db), current_user: User = Depends
 
 @router.post("/stop-break", response_model=ClockActionResponse)
 def post_stop_break(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    emp = require_employee_for_user(db, current_user.id)
+    employee_id = employee_id_for_user(db, current_user.id)
     try:
-        ws = stop_break(db, emp.id)
+        ws = stop_break(db, employee_id)
         db.commit()
         return ClockActionResponse(session_id=ws.id, status=ws.status, message="Break stopped")
     except RuntimeError as e:
@@ -54,8 +56,8 @@ def post_clock_out(
     current_user: User = Depends(get_current_user)
 ):
     try:
-        emp = require_employee_for_user(db, current_user.id)
-        ws = clock_out(db, emp.id)
+        employee_id = employee_id_for_user(db, current_user.id)
+        ws = clock_out(db, employee_id)
         return ClockActionResponse(
             session_id=ws.id,
             status=ws.status,
@@ -64,11 +66,43 @@ def post_clock_out(
     except RuntimeError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
+@router.post("/batch", response_model=list[ClockActionResponse])
+def post_batch(
+    actions: list[ClockBatchAction],
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Run clock actions in order in one transaction; any failure rolls back the whole batch"""
+    employee_id = employee_id_for_user(db, current_user.id)
+    results = []
+    try:
+        for i, action in enumerate(actions):
+            if action.op == "clock-in":
+                ws = clock_in(db, employee_id, commit=False)
+                message = f"Clocked in at {format_ist_time_12h(ws.clock_in_time)} IST"
+            elif action.op == "start-break":
+                ws = start_break(db, employee_id)
+                message = "Break started"
+            elif action.op == "stop-break":
+                ws = stop_break(db, employee_id)
+                message = "Break stopped"
+            else:
+                ws = clock_out(db, employee_id, commit=False)
+                message = f"Clocked out at {format_ist_time_12h(ws.clock_out_time)} IST"
+            # autoflush is off: the next action's queries must see this one's rows
+            db.flush()
+            results.append(ClockActionResponse(session_id=ws.id, status=ws.status, message=message))
+        db.commit()
+    except RuntimeError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Action {i} ({action.op}): {e}")
+    return results
+
 
 @router.get("/recent", response_model=list[WorkSessionDayRow])
 def get_recent(days: int = 14, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    emp = require_employee_for_user(db, current_user.id)
-    data = sessions_last_days(db, emp.id, days)
+    employee_id = employee_id_for_user(db, current_user.id)
+    data = sessions_last_days(db, employee_id, days)
     return [WorkSessionDayRow(**row) for row in data]
 
 @router.get("/today-completed")
@@ -77,8 +111,8 @@ def get_today_completed_sessions(
     current_user: User = Depends(get_current_user)
 ):
     """Get completed work sessions for today only"""
-    emp = require_employee_for_user(db, current_user.id)
-    return get_today_completed_work(db, emp.id)
+    employee_id = employee_id_for_user(db, current_user.id)
+    return get_today_completed_work(db, employee_id)
 
 @router.get("/timesheet")
 def get_timesheet_history(
@@ -88,23 +122,26 @@ def get_timesheet_history(
 ):
     """Get last 14 days attendance history for timesheet"""
     try:
-        emp = require_employee_for_user(db, current_user.id)
+        employee_id = employee_id_for_user(db, current_user.id)
         
         # Get last 14 days of completed sessions
-        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        cutoff = utc_now() - timedelta(days=days)
         
+        in_window = (
+            WorkSession.employee_id == employee_id,
+            WorkSession.clock_in_time >= cutoff,
+            WorkSession.status == "ended"  # Only completed sessions
+        )
         sessions = (
             db.query(WorkSession)
-            .filter(
-                WorkSession.employee_id == emp.id,
-                WorkSession.clock_in_time >= cutoff.replace(tzinfo=None),
-                WorkSession.status == "ended"  # Only completed sessions
-            )
+            .filter(*in_window)
             .order_by(WorkSession.clock_in_time.desc())
             .all()
         )
         
         IST = ZoneInfo("Asia/Kolkata")
+        # Same window as a subquery, not an id list: a long `days` would blow MSSQL's 2100-parameter limit
+        breaks_by_session = sum_breaks_by_session(db, select(WorkSession.id).where(*in_window)) if sessions else {}
         
         results = []
         for session in sessions:
@@ -112,8 +149,7 @@ def get_timesheet_history(
             clock_in_ist = session.clock_in_time.replace(tzinfo=timezone.utc).astimezone(IST)
             clock_out_ist = session.clock_out_time.replace(tzinfo=timezone.utc).astimezone(IST) if session.clock_out_time else None
             
-            # Calculate break duration using the imported function
-            break_seconds = _sum_breaks(db, session.id) or 0
+            break_seconds = breaks_by_session.get(session.id, 0)
             
             # Format durations
             work_hours = (session.total_work_seconds or 0) // 3600
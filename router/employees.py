@@ -1,11 +1,12 @@
 # employees.py
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from models import Employee, User
 from schemas import EmployeeCreate, EmployeeUpdate, EmployeeOut, AvatarUpdateRequest, EmployeeProfileUpdate  # ✅ ADD EmployeeProfileUpdate
 from db import get_db
 from dependencies import get_current_user, allow_admin, get_current_employee
 from typing import List
+from services.attendance_rt import employee_id_for_user, forget_employee_for_user
 import models  # ✅ ADD this for models.Employee reference
 import schemas  # ✅ ADD this for schemas.EmployeeProfileUpdate reference
 
@@ -15,10 +16,11 @@ router = APIRouter(prefix="/employees", tags=["Employees"])
 # ---------- Existing endpoint (keep) ----------
 @router.get("/me/employee-id")
 def my_employee_id(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    emp = db.query(Employee).filter(Employee.user_id == current_user.id).first()
-    if not emp:
+    # Same per-process user -> employee id cache as the realtime endpoints (cleared on delete)
+    try:
+        return {"employee_id": employee_id_for_user(db, current_user.id)}
+    except ValueError:
         raise HTTPException(status_code=404, detail="Employee profile not found")
-    return {"employee_id": emp.id}
 
 
 # ---------- Updated endpoint ----------
@@ -31,9 +33,6 @@ def my_employee_profile(
     if not emp:
         raise HTTPException(status_code=404, detail="Employee profile not found")
     
-    # Get username from user table
-    user = db.query(User).filter(User.id == current_user.id).first()
-    
     # Create response with username
     response_data = {
         "id": emp.id,
@@ -43,7 +42,7 @@ def my_employee_profile(
         "phone": emp.phone,
         "avatar_url": emp.avatar_url,
         "emp_code": emp.emp_code,
-        "username": user.username if user else None
+        "username": current_user.username  # already loaded by get_current_user
     }
     
     return response_data
@@ -96,12 +95,19 @@ def create_employee(employee: EmployeeCreate, db: Session = Depends(get_db), cur
 @router.get("/", response_model=List[EmployeeOut], dependencies=[Depends(allow_admin)])
 def read_employees(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
     """Get all employees with user data (admin only)"""
-    employees = db.query(Employee).order_by(Employee.id.desc()).offset(skip).limit(limit).all()
+    # ✅ JOIN USERS IN THE SAME QUERY (was one extra User query per employee)
+    employees = (
+        db.query(Employee)
+        .options(joinedload(Employee.user))
+        .order_by(Employee.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
     
     result = []
     for emp in employees:
-        # ✅ FETCH USER DATA FOR EACH EMPLOYEE
-        user = db.query(User).filter(User.id == emp.user_id).first()
+        user = emp.user
         
         # Create response manually to include username
         emp_data = {
@@ -148,8 +154,10 @@ def delete_employee(employee_id: int, db: Session = Depends(get_db)):
     employee = db.query(Employee).filter(Employee.id == employee_id).first()
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
+    user_id = employee.user_id
     db.delete(employee)
     db.commit()
+    forget_employee_for_user(user_id)
     return {"detail": "Employee deleted"}
 
 
@@ -5,7 +5,7 @@ from schemas import LeaveRequestCreate, LeaveRequestUpdate, LeaveRequestOut
 from db import get_db
 from dependencies import get_current_user, allow_admin
 from typing import List
-from utils import ensure_utc_naive
+from services.timezone_utils import ensure_utc_naive
 
 router = APIRouter(prefix="/leaves", tags=["Leaves"])
 
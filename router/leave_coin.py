@@ -14,7 +14,7 @@ def read_my_balance(db: Session = Depends(get_db), current_user: User = Depends(
     emp = db.query(Employee).filter(Employee.user_id == current_user.id).first()
     if not emp:
         raise HTTPException(status_code=404, detail="Employee profile not found")
-    data = get_available_coins(db, emp.id)
+    data = get_available_coins(db, emp.id, use_cache=True)
     return data
 
 @router.get("/employees/{employee_id}", response_model=LeaveBalanceOut, dependencies=[Depends(allow_admin)])
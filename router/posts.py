@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import func
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
+from collections import defaultdict
 from datetime import datetime
 from services.timezone_utils import format_ist_datetime
 from models import Post, PostReaction, PostView, User
@@ -34,14 +36,12 @@ def get_posts(
     result = []
     for post in posts:
         # Count reactions by emoji
-        reaction_counts = {}
+        reaction_counts = defaultdict(int)
         user_reactions = []
         
         for reaction in post.reactions:
             # ✅ ENSURE PROPER EMOJI HANDLING
             emoji = reaction.emoji if reaction.emoji else "👍"  # Fallback
-            if emoji not in reaction_counts:
-                reaction_counts[emoji] = 0
             reaction_counts[emoji] += 1
             
             if reaction.user_id == current_user.id:
@@ -64,7 +64,7 @@ def get_posts(
             updated_at=format_ist_datetime(post.updated_at),
             is_pinned=post.is_pinned,
             status=post.status,
-            reaction_counts=reaction_counts,
+            reaction_counts=dict(reaction_counts),
             user_reactions=user_reactions,
             is_viewed=is_viewed
         )
@@ -139,17 +139,14 @@ def mark_post_viewed(
 @router.get("/unread/count", response_model=UnreadCountOut)
 def get_unread_count(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Get count of unread posts"""
-    # Get all published posts
-    all_posts = db.query(Post.id).filter(Post.status == "published").all()
-    all_post_ids = [p.id for p in all_posts]
-    
-    # Get viewed post IDs for current user
-    viewed_posts = db.query(PostView.post_id).filter(
+    # Published posts with no view row for this user, counted in the database
+    viewed = db.query(PostView.id).filter(
+        PostView.post_id == Post.id,
         PostView.user_id == current_user.id
-    ).all()
-    viewed_post_ids = [v.post_id for v in viewed_posts]
-    
-    # Calculate unread count
-    unread_count = len([pid for pid in all_post_ids if pid not in viewed_post_ids])
+    )
+    unread_count = db.query(func.count(Post.id)).filter(
+        Post.status == "published",
+        ~viewed.exists()
+    ).scalar()
     
     return UnreadCountOut(unread_count=unread_count)
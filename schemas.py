@@ -1,7 +1,7 @@
 from pydantic import BaseModel, field_serializer, computed_field, Field, validator
 from typing import Optional, Literal, List
 from datetime import datetime
-from utils import to_ist
+from services.timezone_utils import format_ist_date, format_ist_datetime, to_ist
 import re
 # User schemas
 class UserCreate(BaseModel):
@@ -145,28 +145,25 @@ class LeaveBalanceOut(BaseModel):
     expiring_soon: list[dict]
     recent_txns: list[dict]
 
+    # The service hands back raw UTC datetimes; format them once, here, for the response
     @field_serializer("expiring_soon")
     def serialize_expiry(self, v):
-        from utils import to_ist
-        out = []
-        for item in v:
-            out.append({
-                "expiry_date": to_ist(item["expiry_date"]),
-                "amount": item["amount"],
-            })
-        return out
+        return [
+            {"expiry_date": format_ist_date(item["expiry_date"]), "amount": item["amount"]}
+            for item in v
+        ]
 
     @field_serializer("recent_txns")
     def serialize_txns(self, v):
-        out = []
-        for t in v:
-            out.append({
+        return [
+            {
                 "type": t["type"],
-                "amount": t["amount"], 
-                "occurred_at": t["occurred_at"],  # ✅ FIXED: Use string directly
+                "amount": t["amount"],
+                "occurred_at": format_ist_datetime(t["occurred_at"]),
                 "comment": t.get("comment"),
-                })
-            return out
+            }
+            for t in v
+        ]
 
     class Config:
         from_attributes = True
@@ -196,6 +193,9 @@ class ClockActionResponse(BaseModel):
     status: Literal["active", "break", "ended"]
     message: str
 
+class ClockBatchAction(BaseModel):
+    op: Literal["clock-in", "start-break", "stop-break", "clock-out"]
+
 
 # Post schemas
 class PostCreate(BaseModel):
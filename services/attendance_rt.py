@@ -1,17 +1,20 @@
 # services/attendance_rt.py
 from datetime import datetime, timezone, timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+import threading
+from functools import lru_cache
+from cachetools import TTLCache
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy import Integer, cast, func, insert, literal_column, select
 from models import WorkSession, BreakInterval, Employee
 from .timezone_utils import (
-    utc_now, format_ist_datetime, format_ist_time_12h, 
-    format_ist_date, debug_timezone_info
+    IST, utc_now, format_ist_datetime, format_ist_time_12h, 
+    format_ist_bundle, debug_timezone_info
 )
 
 # IST Timezone Utilities
 def _ist_timezone():
     """Return IST timezone object (UTC+5:30)"""
-    return timezone(timedelta(hours=5, minutes=30))
+    return IST
 
 def _utc_to_ist(utc_dt):
     """Convert UTC datetime to IST"""
@@ -19,14 +22,13 @@ def _utc_to_ist(utc_dt):
         return None
     if utc_dt.tzinfo is None:
         utc_dt = utc_dt.replace(tzinfo=timezone.utc)
-    return utc_dt.astimezone(_ist_timezone())
+    return utc_dt.astimezone(IST)
 
 def _ist_format(utc_dt):
     """Format UTC datetime as IST string for API responses"""
     if utc_dt is None:
         return None
-    ist_dt = _utc_to_ist(utc_dt)
-    return ist_dt.strftime("%Y-%m-%d %H:%M:%S")
+    return _utc_to_ist(utc_dt).strftime("%Y-%m-%d %H:%M:%S")
 
 def _utc_now():
     return utc_now()  # Use universal utility
@@ -34,16 +36,57 @@ def _utc_now():
 # def _utc_now():
 #     return datetime.now(timezone.utc).replace(tzinfo=None)  # store naive UTC
 
+def _seconds_between(db: Session, start, end):
+    """SQL expression for the whole seconds from start to end (naive UTC columns)
+
+    Truncated per interval, exactly like int(timedelta.total_seconds()), by
+    working in microseconds: DATEDIFF(second) counts boundaries crossed, and
+    SQLite's julianday difference is a float that lands just under whole seconds.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "mssql":
+        return func.datediff_big(literal_column("microsecond"), start, end) // 1_000_000
+    if dialect == "postgresql":
+        return func.floor(func.extract("epoch", end - start))
+
+    # SQLite stores "YYYY-MM-DD HH:MM:SS.ffffff": whole seconds from the first 19
+    # characters (strftime would round the fraction to ms), microseconds from the rest
+    def micros(ts):
+        whole = cast(func.strftime("%s", func.substr(ts, 1, 19)), Integer)
+        return whole * 1_000_000 + cast(func.substr(ts, 21, 6), Integer)
+
+    return (micros(end) - micros(start)) // 1_000_000
+
 def _sum_breaks(db: Session, session_id: int, as_of: datetime | None = None) -> int:
+    """Total break seconds of one session, summed by the database"""
     as_of = as_of or _utc_now()
-    intervals = db.query(BreakInterval).filter(BreakInterval.session_id == session_id).all()
-    total = 0
-    for b in intervals:
-        if b.end_time:
-            total += int((b.end_time - b.start_time).total_seconds())
-        else:
-            total += int((as_of - b.start_time).total_seconds())
-    return max(total, 0)
+    seconds = _seconds_between(db, BreakInterval.start_time, func.coalesce(BreakInterval.end_time, as_of))
+    total = (
+        db.query(func.coalesce(func.sum(seconds), 0))
+        .filter(BreakInterval.session_id == session_id)
+        .scalar()
+    )
+    return max(int(total), 0)
+
+def sum_breaks_by_session(db: Session, session_ids, as_of: datetime | None = None) -> dict[int, int]:
+    """Break seconds per session in one GROUP BY query; open breaks run until as_of"""
+    as_of = as_of or _utc_now()
+    seconds = _seconds_between(db, BreakInterval.start_time, func.coalesce(BreakInterval.end_time, as_of))
+    rows = (
+        db.query(BreakInterval.session_id, func.sum(seconds))
+        .filter(BreakInterval.session_id.in_(session_ids))
+        .group_by(BreakInterval.session_id)
+        .all()
+    )
+    return {session_id: max(int(total or 0), 0) for session_id, total in rows}
+
+def _close_open_breaks(db: Session, session_id: int, now: datetime) -> int:
+    """End any open break of the session with a single UPDATE; returns rows closed"""
+    return (
+        db.query(BreakInterval)
+        .filter(BreakInterval.session_id == session_id, BreakInterval.end_time.is_(None))
+        .update({BreakInterval.end_time: now}, synchronize_session=False)
+    )
 
 def _elapsed_work_seconds(clock_in: datetime, breaks_seconds: int, clock_out: datetime | None = None, as_of: datetime | None = None) -> int:
     end = clock_out or (as_of or _utc_now())
@@ -53,6 +96,7 @@ def _elapsed_work_seconds(clock_in: datetime, breaks_seconds: int, clock_out: da
 def get_active_session(db: Session, employee_id: int) -> WorkSession | None:
     return (
         db.query(WorkSession)
+        .options(raiseload("*"))  # attendance paths never need related rows; fail loudly on lazy loads
         .filter(WorkSession.employee_id == employee_id, WorkSession.status.in_(["active", "break"]))
         .order_by(WorkSession.id.desc())
         .first()
@@ -64,17 +108,42 @@ def require_employee_for_user(db: Session, user_id: int) -> Employee:
         raise ValueError("Employee profile not found")
     return emp
 
-def clock_in(db: Session, employee_id: int) -> WorkSession:
+# user_id -> employee_id; employees.user_id is unique and never reassigned, so the
+# mapping only goes stale when the employee is deleted. forget_employee_for_user
+# clears it in the worker that handled the delete; the TTL bounds how long any
+# other worker can keep handing out the deleted id.
+_employee_id_by_user: TTLCache = TTLCache(maxsize=4096, ttl=60)
+_employee_id_lock = threading.Lock()
+
+def employee_id_for_user(db: Session, user_id: int) -> int:
+    """Cached employee id lookup for the realtime endpoints"""
+    with _employee_id_lock:
+        employee_id = _employee_id_by_user.get(user_id)
+    if employee_id is None:
+        row = db.query(Employee.id).filter(Employee.user_id == user_id).first()
+        if not row:
+            raise ValueError("Employee profile not found")
+        employee_id = row.id
+        with _employee_id_lock:
+            _employee_id_by_user[user_id] = employee_id
+    return employee_id
+
+def forget_employee_for_user(user_id: int) -> None:
+    with _employee_id_lock:
+        _employee_id_by_user.pop(user_id, None)
+
+def clock_in(db: Session, employee_id: int, commit: bool = True) -> WorkSession:
     existing = get_active_session(db, employee_id)
     if existing:
         return existing
     
     now = _utc_now()
-    ws = WorkSession(employee_id=employee_id, clock_in_time=now, status="active", total_work_seconds=0)
-    db.add(ws)
-    db.commit()  # COMMIT instead of flush
-    db.refresh(ws)  # Refresh to get the ID
-    return ws
+    values = dict(employee_id=employee_id, clock_in_time=now, status="active", total_work_seconds=0)
+    # RETURNING (OUTPUT on MSSQL) hands back the new id, so no refresh SELECT after commit
+    session_id = db.execute(insert(WorkSession).values(**values).returning(WorkSession.id)).scalar_one()
+    if commit:
+        db.commit()
+    return WorkSession(id=session_id, **values)  # detached copy for the response only
 
 
 def start_break(db: Session, employee_id: int) -> WorkSession:
@@ -95,21 +164,13 @@ def stop_break(db: Session, employee_id: int) -> WorkSession:
     if not ws or ws.status != "break":
         raise RuntimeError("No break in progress")
     now = _utc_now()
-    open_break = (
-        db.query(BreakInterval)
-        .filter(BreakInterval.session_id == ws.id, BreakInterval.end_time.is_(None))
-        .order_by(BreakInterval.id.desc())
-        .first()
-    )
-    if not open_break:
+    if not _close_open_breaks(db, ws.id, now):
         raise RuntimeError("Break state inconsistent")
-    open_break.end_time = now
-    db.add(open_break)
     ws.status = "active"
     db.add(ws)
     return ws
 
-def clock_out(db: Session, employee_id: int) -> WorkSession:
+def clock_out(db: Session, employee_id: int, commit: bool = True) -> WorkSession:
     ws = get_active_session(db, employee_id)
     if not ws or ws.status == "ended":
         raise RuntimeError("No active session to clock out")
@@ -117,25 +178,23 @@ def clock_out(db: Session, employee_id: int) -> WorkSession:
     now = _utc_now()
     if ws.status == "break":
         # Handle open break
-        open_break = (
-            db.query(BreakInterval)
-            .filter(BreakInterval.session_id == ws.id, BreakInterval.end_time.is_(None))
-            .order_by(BreakInterval.id.desc())
-            .first()
-        )
-        if open_break:
-            open_break.end_time = now
-            db.add(open_break)
+        _close_open_breaks(db, ws.id, now)
 
     breaks_sec = _sum_breaks(db, ws.id, as_of=now)
     ws.clock_out_time = now
     ws.total_work_seconds = _elapsed_work_seconds(ws.clock_in_time, breaks_sec, clock_out=now)
     ws.status = "ended"
     db.add(ws)
-    db.commit()
-    db.refresh(ws)
+    if commit:
+        db.commit()
+        db.refresh(ws)
     return ws
 
+@lru_cache(maxsize=1024)
+def _clock_in_label(session_id: int, clock_in_time: datetime) -> str:
+    """IST clock-in string for a session; clock_in_time never changes, so format once"""
+    return format_ist_datetime(clock_in_time)
+
 def session_state(db: Session, employee_id: int) -> dict:
     ws = get_active_session(db, employee_id)
     if not ws:
@@ -166,7 +225,7 @@ def session_state(db: Session, employee_id: int) -> dict:
     return {
         "session_id": ws.id,
         "status": ws.status,
-        "clock_in_time": format_ist_datetime(ws.clock_in_time),
+        "clock_in_time": _clock_in_label(ws.id, ws.clock_in_time),
         "clock_out_time": format_ist_datetime(ws.clock_out_time),
         "elapsed_work_seconds": _elapsed_work_seconds(ws.clock_in_time, breaks_sec, ws.clock_out_time, now),
         "elapsed_break_seconds": ongoing_break_sec,
@@ -174,24 +233,32 @@ def session_state(db: Session, employee_id: int) -> dict:
 
 
 def sessions_last_days(db: Session, employee_id: int, days: int) -> list[dict]:
-    cutoff = _utc_now() - timedelta(days=days)
+    now = _utc_now()
+    cutoff = now - timedelta(days=days)
+    in_window = (WorkSession.employee_id == employee_id, WorkSession.clock_in_time >= cutoff)
     rows = (
         db.query(WorkSession)
-        .filter(WorkSession.employee_id == employee_id, WorkSession.clock_in_time >= cutoff)
+        .options(raiseload("*"))
+        .filter(*in_window)
         .order_by(WorkSession.clock_in_time.desc())
         .all()
     )
+    if not rows:
+        return []
+    # One aggregate query for every session's breaks instead of one per row
+    breaks_by_session = sum_breaks_by_session(db, select(WorkSession.id).where(*in_window), as_of=now)
     out = []
     for s in rows:
-        breaks_sec = _sum_breaks(db, s.id, as_of=_utc_now()) or 0
+        breaks_sec = breaks_by_session.get(s.id, 0)
         total_work = (
-            (s.total_work_seconds if s.status == "ended" else _elapsed_work_seconds(s.clock_in_time, breaks_sec))
+            (s.total_work_seconds if s.status == "ended" else _elapsed_work_seconds(s.clock_in_time, breaks_sec, as_of=now))
             or 0
         )
         ot_sec = 0
+        clock_in_ist = format_ist_bundle(s.clock_in_time)
         out.append({
-            "date": format_ist_date(s.clock_in_time),
-            "first_clock_in": format_ist_datetime(s.clock_in_time),
+            "date": clock_in_ist["date"],
+            "first_clock_in": clock_in_ist["datetime"],
             "last_clock_out": format_ist_datetime(s.clock_out_time),
             "total_work_seconds": total_work if total_work is not None else 0,
             "total_break_seconds": breaks_sec if breaks_sec is not None else 0,
@@ -208,18 +275,19 @@ def get_today_completed_work(db: Session, employee_id: int) -> dict:
     today_start = datetime(now.year, now.month, now.day)
     today_end = today_start + timedelta(days=1)
     
-    # Query completed sessions from today
-    sessions = db.query(WorkSession).filter(
+    # Sum and count completed sessions from today in the database
+    total_work_seconds, session_count = db.query(
+        func.coalesce(func.sum(WorkSession.total_work_seconds), 0),
+        func.count(WorkSession.id),
+    ).filter(
         WorkSession.employee_id == employee_id,
         WorkSession.status == "ended",
         WorkSession.clock_in_time >= today_start,
         WorkSession.clock_in_time < today_end
-    ).all()
-    
-    total_work_seconds = sum(s.total_work_seconds or 0 for s in sessions)
+    ).one()
     
     return {
-        "total_work_seconds": total_work_seconds,
-        "session_count": len(sessions),
+        "total_work_seconds": int(total_work_seconds),
+        "session_count": session_count,
         "date": today_start.date().isoformat()
     }
@@ -1,11 +1,44 @@
-from datetime import datetime, timedelta, timezone
+import threading
+from datetime import date, datetime, timedelta, timezone
+from cachetools import TTLCache
+from sqlalchemy import event, func, literal_column
 from sqlalchemy.orm import Session
 from models import LeaveCoin, LeaveCoinTxn
-from .timezone_utils import format_ist_datetime, format_ist_date
 
 ROLLING_MONTHS = 12
 CAP_COINS = 10
 
+# Active-coin predicate rendered with an inline 0 rather than a bound parameter:
+# MSSQL only matches a filtered index when the query's predicate is a literal,
+# so `remaining > @p` would never use ix_leave_coins_active.
+_HAS_REMAINING = LeaveCoin.remaining > literal_column("0")
+
+# Short-lived balance cache for the "my balance" display, keyed by employee_id
+# only (the session is not hashable). Writers mark the employee stale on their
+# session and the entry is dropped once that session commits, so a reader can
+# never re-cache the pre-commit balance. Validation paths bypass the cache.
+_balance_cache: TTLCache = TTLCache(maxsize=4096, ttl=30)
+_balance_lock = threading.Lock()
+_STALE_KEY = "leave_coins_stale_balances"
+
+def _invalidate_balance(*employee_ids: int) -> None:
+    with _balance_lock:
+        for employee_id in employee_ids:
+            _balance_cache.pop(employee_id, None)
+
+def _mark_balance_stale(db: Session, *employee_ids: int) -> None:
+    db.info.setdefault(_STALE_KEY, set()).update(employee_ids)
+
+@event.listens_for(Session, "after_commit")
+def _drop_committed_balances(session: Session) -> None:
+    stale = session.info.pop(_STALE_KEY, None)
+    if stale:
+        _invalidate_balance(*stale)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_balances(session: Session) -> None:
+    session.info.pop(_STALE_KEY, None)
+
 def _aware_utc(dt):
     if dt is None:
         return None
@@ -30,32 +63,59 @@ def _expiry_from_grant(grant_date: datetime) -> datetime:
     except Exception:
         return grant_date + timedelta(days=365)
 
-def get_available_coins(db: Session, employee_id: int, as_of: datetime | None = None) -> dict:
-    as_of = _aware_utc(as_of or datetime.now(timezone.utc))
+def _sum_available(db: Session, employee_id: int, as_of: datetime) -> int:
+    """Raw (uncapped) coin balance as a single SQL aggregate"""
+    as_of = _aware_utc(as_of)
+    # Served by ix_leave_coins_active (employee_id, expiry_date WHERE remaining > 0,
+    # INCLUDE remaining, grant_date) via the literal _HAS_REMAINING predicate.
+    total = db.query(func.coalesce(func.sum(LeaveCoin.remaining), 0)).filter(
+        LeaveCoin.employee_id == employee_id,
+        LeaveCoin.grant_date >= _naive(_rolling_window_start(as_of)),
+        LeaveCoin.expiry_date > _naive(as_of),
+        _HAS_REMAINING
+    ).scalar()
+    return int(total)
+
+def get_available_coins(db: Session, employee_id: int, as_of: datetime | None = None, use_cache: bool = False) -> dict:
+    """Current balance summary; `use_cache` is for display endpoints only."""
+    if use_cache and as_of is None:
+        with _balance_lock:
+            cached = _balance_cache.get(employee_id)
+        if cached is not None:
+            return cached
+        data = _compute_available_coins(db, employee_id, datetime.now(timezone.utc))
+        with _balance_lock:
+            _balance_cache[employee_id] = data
+        return data
+    return _compute_available_coins(db, employee_id, as_of or datetime.now(timezone.utc))
+
+def _compute_available_coins(db: Session, employee_id: int, as_of: datetime) -> dict:
+    as_of = _aware_utc(as_of)
     window_start = _rolling_window_start(as_of)
     as_of_naive = _naive(as_of)
     window_start_naive = _naive(window_start)
 
-    coins = db.query(LeaveCoin).filter(
-        LeaveCoin.employee_id == employee_id,
-        LeaveCoin.grant_date >= window_start_naive,
-        LeaveCoin.expiry_date > as_of_naive,
-        LeaveCoin.remaining > 0
-    ).all()
-
-    raw_available = sum(c.remaining for c in coins)
+    raw_available = _sum_available(db, employee_id, as_of)
     available = min(raw_available, CAP_COINS)
 
-    # Expiring soon (next 60 days)
+    # Expiring soon (next 60 days), bucketed by expiry date in the database
     soon_cutoff = as_of + timedelta(days=60)
-    expiring: dict[datetime, int] = {}
-    for c in coins:
-        exp = _aware_utc(c.expiry_date)
-        if exp <= soon_cutoff:
-            expiring[exp] = expiring.get(exp, 0) + c.remaining
+    buckets = (
+        db.query(LeaveCoin.expiry_date, func.sum(LeaveCoin.remaining))
+        .filter(
+            LeaveCoin.employee_id == employee_id,
+            LeaveCoin.grant_date >= window_start_naive,
+            LeaveCoin.expiry_date > as_of_naive,
+            LeaveCoin.expiry_date <= _naive(soon_cutoff),
+            _HAS_REMAINING
+        )
+        .group_by(LeaveCoin.expiry_date)
+        .order_by(LeaveCoin.expiry_date)
+        .all()
+    )
     expiring_soon = [
-        {"expiry_date": format_ist_date(k), "amount": v} 
-        for k, v in sorted(expiring.items(), key=lambda kv: kv)
+        {"expiry_date": expiry, "amount": int(amount)}
+        for expiry, amount in buckets
     ]
     # Last 10 txns
     txns = (
@@ -66,7 +126,7 @@ def get_available_coins(db: Session, employee_id: int, as_of: datetime | None =
         .all()
     )
     recent_txns = [
-        {"type": t.type, "amount": t.amount, "occurred_at": format_ist_datetime(t.occurred_at), "comment": t.comment}
+        {"type": t.type, "amount": t.amount, "occurred_at": t.occurred_at, "comment": t.comment}
         for t in txns
     ]
 
@@ -80,10 +140,10 @@ def get_available_coins(db: Session, employee_id: int, as_of: datetime | None =
 def grant_coins(db: Session, employee_id: int, amount: int = 1, source: str = "monthly_grant", now: datetime | None = None) -> int:
     now = _aware_utc(now or datetime.now(timezone.utc))
     # enforce cap BEFORE granting
-    bal = get_available_coins(db, employee_id, now)
-    if bal["available_coins"] >= CAP_COINS:
+    available = min(_sum_available(db, employee_id, now), CAP_COINS)
+    if available >= CAP_COINS:
         return 0
-    grant_amount = min(amount, CAP_COINS - bal["available_coins"])
+    grant_amount = min(amount, CAP_COINS - available)
     if grant_amount <= 0:
         return 0
 
@@ -107,30 +167,48 @@ def grant_coins(db: Session, employee_id: int, amount: int = 1, source: str = "m
         comment=f"Grant {source}",
     )
     db.add(txn)
+    _mark_balance_stale(db, employee_id)
     return grant_amount
 
 def expire_coins(db: Session, now: datetime | None = None) -> int:
     now = _aware_utc(now or datetime.now(timezone.utc))
     now_naive = _naive(now)
-    coins = db.query(LeaveCoin).filter(
-        LeaveCoin.expiry_date <= now_naive,
-        LeaveCoin.remaining > 0
-    ).all()
+    expired_filter = (LeaveCoin.expiry_date <= now_naive, _HAS_REMAINING)
+    # Most scheduled runs find nothing; a cheap EXISTS probe skips the fetch/update
+    if not db.query(db.query(LeaveCoin.id).filter(*expired_filter).exists()).scalar():
+        return 0
+    # Column rows only: the pre-expiry remaining is needed for the txn log, and
+    # UPDATE ... RETURNING/OUTPUT would hand back the already-zeroed value.
+    # Lock the rows until commit so a concurrent consume cannot change `remaining`
+    # between this read and the UPDATE below (the txn amounts must match what was
+    # zeroed). MSSQL ignores FOR UPDATE, hence the explicit table hint.
+    expired = (
+        db.query(LeaveCoin.id, LeaveCoin.employee_id, LeaveCoin.remaining)
+        .with_hint(LeaveCoin, "WITH (UPDLOCK, ROWLOCK)", "mssql")
+        .filter(*expired_filter)
+        .with_for_update()
+        .all()
+    )
+    if not expired:
+        return 0
 
-    total_expired = 0
-    for c in coins:
-        amt = c.remaining
-        c.remaining = 0
-        total_expired += amt
-        db.add(LeaveCoinTxn(
-            employee_id=c.employee_id,
-            coin_id=c.id,
-            type="expire",
-            amount=amt,
-            occurred_at=now,
-            comment="Auto expiry at 12 months"
-        ))
-    return total_expired
+    db.query(LeaveCoin).filter(*expired_filter).update({LeaveCoin.remaining: 0}, synchronize_session=False)
+    db.execute(
+        LeaveCoinTxn.__table__.insert(),
+        [
+            {
+                "employee_id": c.employee_id,
+                "coin_id": c.id,
+                "type": "expire",
+                "amount": c.remaining,
+                "occurred_at": now,
+                "comment": "Auto expiry at 12 months",
+            }
+            for c in expired
+        ],
+    )
+    _mark_balance_stale(db, *{c.employee_id for c in expired})
+    return sum(c.remaining for c in expired)
 
 def consume_coins(db: Session, employee_id: int, amount: int, ref_leave_request_id: int | None = None, now: datetime | None = None) -> int:
     """
@@ -144,53 +222,66 @@ def consume_coins(db: Session, employee_id: int, amount: int, ref_leave_request_
     now = _aware_utc(now or datetime.now(timezone.utc))
     now_naive = _naive(now)
 
-    coins = (
-        db.query(LeaveCoin)
+    # FIFO running total computed by the database, so only the coins actually
+    # needed to cover `amount` are loaded (those whose preceding total < amount).
+    running = (
+        db.query(
+            LeaveCoin.id.label("id"),
+            LeaveCoin.remaining.label("remaining"),
+            func.sum(LeaveCoin.remaining)
+            .over(order_by=(LeaveCoin.expiry_date.asc(), LeaveCoin.id.asc()))
+            .label("running_total"),
+        )
         .filter(
             LeaveCoin.employee_id == employee_id,
             LeaveCoin.expiry_date > now_naive,
-            LeaveCoin.remaining > 0
+            _HAS_REMAINING
         )
-        .order_by(LeaveCoin.expiry_date.asc(), LeaveCoin.id.asc())
+        .subquery()
+    )
+    coins = (
+        db.query(running.c.id, running.c.remaining)
+        .filter(running.c.running_total - running.c.remaining < amount)
+        .order_by(running.c.running_total.asc())
         .all()
     )
 
     to_consume = amount
     consumed_total = 0
+    coin_updates = []
+    txn_rows = []
     for c in coins:
         if to_consume <= 0:
             break
         take = min(c.remaining, to_consume)
         if take > 0:
-            c.remaining -= take
+            coin_updates.append({"id": c.id, "remaining": c.remaining - take})
             consumed_total += take
             to_consume -= take
-            db.add(LeaveCoinTxn(
-                employee_id=employee_id,
-                coin_id=c.id,
-                type="consume",
-                amount=take,
-                ref_leave_request_id=ref_leave_request_id,
-                occurred_at=now,
-                comment="Consume for approved leave" if ref_leave_request_id else "Consume",
-            ))
+            txn_rows.append({
+                "employee_id": employee_id,
+                "coin_id": c.id,
+                "type": "consume",
+                "amount": take,
+                "ref_leave_request_id": ref_leave_request_id,
+                "occurred_at": now,
+                "comment": "Consume for approved leave" if ref_leave_request_id else "Consume",
+            })
 
     if consumed_total < amount:
-        # Caller must rollback to cancel partial deductions.
+        # Nothing has been written yet; caller should still rollback as before.
         return 0
+    db.bulk_update_mappings(LeaveCoin, coin_updates)
+    db.bulk_insert_mappings(LeaveCoinTxn, txn_rows)
+    _mark_balance_stale(db, employee_id)
     return consumed_total
 
-def _duration_days(start_date: datetime, end_date: datetime) -> int:
+def _duration_days(start_date: date | None, end_date: date | None) -> int:
     """
     Calculate the number of days between start and end dates (inclusive).
-    Both dates should be UTC naive datetimes.
+    Accepts dates or UTC naive datetimes; the time component is ignored.
     """
     if not start_date or not end_date:
         return 0
-    
-    # Convert to dates to avoid time component issues
-    start = start_date.date() if hasattr(start_date, 'date') else start_date
-    end = end_date.date() if hasattr(end_date, 'date') else end_date
-    
-    # Calculate inclusive days (end - start + 1)
-    return (end - start).days + 1
+    # toordinal() is defined on both date and datetime and drops the time part
+    return end_date.toordinal() - start_date.toordinal() + 1
@@ -1,9 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
 import requests
+import logging
 import random
+import re
+import threading
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from sqlalchemy.orm import Session
 from models import DailyQuote
 
+logger = logging.getLogger(__name__)
+
 # Multiple API endpoints for redundancy
 QUOTE_APIS = [
     {"url": "https://api.quotable.io/random", "type": "quotable"},
@@ -11,8 +21,37 @@ QUOTE_APIS = [
     {"url": "https://zenquotes.io/api/random", "type": "zen"}
 ]
 
+# Shared HTTP session: keeps connections alive across API attempts and retries transient 5xx
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=4,
+        max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+    ),
+)
+
+# Upper bound on waiting for the APIs as a group (each one may retry on its own)
+QUOTE_FETCH_DEADLINE = 10
+
+# Today's quote per process, keyed by UTC midnight. Short TTL: the scheduled fetch
+# or /refresh-today in one worker rewrites the row, and the other workers'
+# copies must not outlive that by more than a minute.
+_TODAY_CACHE: TTLCache = TTLCache(maxsize=2, ttl=60)
+_TODAY_LOCK = threading.Lock()
+
+def _cache_today(key: datetime, quote: dict) -> None:
+    with _TODAY_LOCK:
+        _TODAY_CACHE.clear()
+        _TODAY_CACHE[key] = quote
+
+def _cached_today(key: datetime) -> dict | None:
+    with _TODAY_LOCK:
+        return _TODAY_CACHE.get(key)
+
 # Curated fallback quotes for reliability
-FALLBACK_QUOTES = [
+FALLBACK_QUOTES = (
     ("Success is not final, failure is not fatal: it is the courage to continue that counts.", "Winston Churchill"),
     ("The only way to do great work is to love what you do.", "Steve Jobs"),
     ("Innovation distinguishes between a leader and a follower.", "Steve Jobs"),
@@ -21,23 +60,34 @@ FALLBACK_QUOTES = [
     ("Excellence is never an accident. It is always the result of high intention, sincere effort, and intelligent execution.", "Aristotle"),
     ("The only impossible journey is the one you never begin.", "Tony Robbins"),
     ("Believe you can and you're halfway there.", "Theodore Roosevelt"),
-]
+)
+_pick_fallback = random.Random().choice
+
+@lru_cache(maxsize=2)
+def _cached_utc_midnight(ymd: tuple) -> datetime:
+    """UTC midnight for (year, month, day), naive like DailyQuote.date_utc"""
+    return datetime(*ymd)
+
+def _today_key() -> datetime:
+    """Today's DailyQuote.date_utc key; built once per UTC day (datetimes are immutable)"""
+    n = datetime.now(timezone.utc)
+    return _cached_utc_midnight((n.year, n.month, n.day))
 
-def _utc_midnight(dt: datetime) -> datetime:
-    """Convert datetime to UTC midnight"""
-    d = dt.astimezone(timezone.utc)
-    return datetime(d.year, d.month, d.day, tzinfo=timezone.utc).replace(tzinfo=None)
+# Substring match (no word boundaries), same as the original per-word `in` checks
+_BLOCKED_RE = re.compile(r"hate|violence|discrimination|stupid|idiot", re.IGNORECASE)
+
+_PLACEHOLDER_AUTHORS = frozenset({"unknown", "null"})
 
 def validate_quote_quality(text: str, author: str) -> bool:
     """Ensure quotes meet quality standards"""
-    if not text or len(text) < 20 or len(text) > 300:
+    # Cheap checks first: most rejected API responses are empty or too short
+    if not text or not 20 <= len(text) <= 300:
         return False
-    if not author or author.lower() in ["unknown", "", "null"]:
+    if not author or author.lower() in _PLACEHOLDER_AUTHORS:
         return False
     
-    # Check for inappropriate content
-    blocked_words = ["hate", "violence", "discrimination", "stupid", "idiot"]
-    if any(word in text.lower() for word in blocked_words):
+    # Check for inappropriate content (the only scan over the quote text)
+    if _BLOCKED_RE.search(text):
         return False
     
     return True
@@ -52,94 +102,134 @@ def fetch_quote_from_api(api_config: dict) -> tuple:
                 "tags": "motivational|inspirational|wisdom|success"
             }
         
-        r = requests.get(api_config["url"], timeout=10, params=params)
+        r = _SESSION.get(api_config["url"], timeout=(3, 5), params=params)  # (connect, read)
         r.raise_for_status()
         
+        data = r.json()  # parse the body once
+        if isinstance(data, list) and api_config["type"] in ("inspire", "zen"):
+            data = data[0]
+        
         if api_config["type"] == "quotable":
-            data = r.json()
             text = data.get("content", "")
             author = data.get("author", "")
             
         elif api_config["type"] == "inspire":
-            data = r.json()[0] if isinstance(r.json(), list) else r.json()
             text = data.get("content", "")
             author = data.get("author", "")
             
         elif api_config["type"] == "zen":
-            data = r.json()[0] if isinstance(r.json(), list) else r.json()
             text = data.get("q", "")
             author = data.get("a", "")
         
         return text, author
         
     except Exception as e:
-        print(f"API {api_config['url']} failed: {e}")
+        logger.warning("API %s failed: %s", api_config["url"], e)
         return "", ""
 
 def fetch_and_store_quote(db: Session):
     """Enhanced quote fetching with multiple API fallbacks"""
     text, author = "", ""
     
-    # Try different APIs
-    for api_config in QUOTE_APIS:
-        text, author = fetch_quote_from_api(api_config)
-        
-        if validate_quote_quality(text, author):
-            print(f"Successfully fetched quote from {api_config['type']}")
-            break
-        else:
-            print(f"Quote from {api_config['type']} failed validation")
+    # Query all APIs at once and take the first valid quote to arrive. No `with`:
+    # its shutdown(wait=True) would block on the slowest API even after a winner.
+    pool = ThreadPoolExecutor(max_workers=len(QUOTE_APIS))
+    futures = {pool.submit(fetch_quote_from_api, api_config): api_config for api_config in QUOTE_APIS}
+    try:
+        for future in as_completed(futures, timeout=QUOTE_FETCH_DEADLINE):
+            api_config = futures[future]
+            text, author = future.result()
+            
+            if validate_quote_quality(text, author):
+                logger.info("Successfully fetched quote from %s", api_config["type"])
+                break
+            else:
+                logger.info("Quote from %s failed validation", api_config["type"])
+    except FuturesTimeout:
+        logger.warning("No quote API answered within %ss", QUOTE_FETCH_DEADLINE)
+        text, author = "", ""
+    finally:
+        # Stragglers finish in the background; their results are discarded
+        pool.shutdown(wait=False, cancel_futures=True)
     
     # Use fallback if all APIs failed
     if not validate_quote_quality(text, author):
-        text, author = random.choice(FALLBACK_QUOTES)
-        print("Using fallback quote")
-    
-    # Store in database
-    key = _utc_midnight(datetime.now(timezone.utc))
-    existing = db.query(DailyQuote).filter(DailyQuote.date_utc == key).first()
-    
-    if existing:
-        existing.text = text
-        existing.author = author
-        print(f"Updated existing quote for {key}")
-    else:
-        new_quote = DailyQuote(date_utc=key, text=text, author=author)
-        db.add(new_quote)
-        print(f"Added new quote for {key}")
+        text, author = _pick_fallback(FALLBACK_QUOTES)
+        logger.info("Using fallback quote")
     
+    # Store in database: a single upsert where the dialect has one (PostgreSQL),
+    # otherwise UPDATE first and INSERT only if no row for today exists yet
+    key = _today_key()
     try:
+        if db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(DailyQuote).values(date_utc=key, text=text, author=author)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[DailyQuote.date_utc],
+                set_={"text": stmt.excluded.text, "author": stmt.excluded.author},
+            )
+            db.execute(stmt)
+            logger.info("Upserted quote for %s", key)
+        else:
+            updated = (
+                db.query(DailyQuote)
+                .filter(DailyQuote.date_utc == key)
+                .update({DailyQuote.text: text, DailyQuote.author: author}, synchronize_session=False)
+            )
+            if updated:
+                logger.info("Updated existing quote for %s", key)
+            else:
+                db.add(DailyQuote(date_utc=key, text=text, author=author))
+                logger.info("Added new quote for %s", key)
+        
         db.commit()
-        print("Quote successfully saved to database")
+        _cache_today(key, {"text": text, "author": author})
+        logger.info("Quote successfully saved to database")
     except Exception as e:
-        print(f"Database error: {e}")
+        # A concurrent insert for the same day trips the date_utc unique constraint
+        logger.error("Database error: %s", e)
         db.rollback()
 
+def ensure_today_quote(db: Session) -> bool:
+    """Fetch and store today's quote only if it is missing; returns True if it fetched"""
+    key = _today_key()
+    if _cached_today(key) is not None:
+        return False
+    if db.query(db.query(DailyQuote.id).filter(DailyQuote.date_utc == key).exists()).scalar():
+        return False
+    fetch_and_store_quote(db)
+    return True
+
 def get_today_quote(db: Session) -> dict:
     """Get today's quote from database"""
-    key = _utc_midnight(datetime.now(timezone.utc))
+    key = _today_key()
+    cached = _cached_today(key)
+    if cached is not None:
+        return cached
     
     quote = db.query(DailyQuote).filter(DailyQuote.date_utc == key).first()
     
     if not quote:
         # No quote for today, fetch one
-        print("No quote found for today, fetching...")
+        logger.info("No quote found for today, fetching...")
         fetch_and_store_quote(db)
         quote = db.query(DailyQuote).filter(DailyQuote.date_utc == key).first()
     
     if quote:
-        return {"text": quote.text, "author": quote.author}
+        result = {"text": quote.text, "author": quote.author}
+        _cache_today(key, result)
+        return result
     else:
         # Ultimate fallback
-        fallback = random.choice(FALLBACK_QUOTES)
+        fallback = _pick_fallback(FALLBACK_QUOTES)
         return {"text": fallback[0], "author": fallback[1]}
 
 def get_quote_history(db: Session, days: int = 7) -> list:
     """Get last N days of quotes"""
     start_date = datetime.now(timezone.utc) - timedelta(days=days)
     
-    quotes = (
-        db.query(DailyQuote)
+    rows = (
+        db.query(DailyQuote.text, DailyQuote.author, DailyQuote.date_utc)
         .filter(DailyQuote.date_utc >= start_date.replace(tzinfo=None))
         .order_by(DailyQuote.date_utc.desc())
         .limit(days)
@@ -148,9 +238,9 @@ def get_quote_history(db: Session, days: int = 7) -> list:
     
     return [
         {
-            "text": q.text, 
-            "author": q.author, 
-            "date": q.date_utc.strftime("%Y-%m-%d")
+            "text": text, 
+            "author": author, 
+            "date": date_utc.strftime("%Y-%m-%d")
         } 
-        for q in quotes
+        for text, author, date_utc in rows
     ]
@@ -1,14 +1,23 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.executors.asyncio import AsyncIOExecutor
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime
 import asyncio
+import logging
 from sqlalchemy.orm import Session
-from services.quotes import fetch_and_store_quote
-from db import get_db
+from services.quotes import ensure_today_quote
+from db import db_session, job_lock
+
+logger = logging.getLogger("scheduler")
 
 class QuoteScheduler:
     def __init__(self):
-        self.scheduler = AsyncIOScheduler()
+        # Quote jobs make blocking HTTP + SQLAlchemy calls: run them on a dedicated
+        # single worker thread so they never touch the event loop or run concurrently
+        self.scheduler = AsyncIOScheduler(
+            executors={"default": AsyncIOExecutor(), "blocking_db": ThreadPoolExecutor(max_workers=1)},
+            job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": 3600}
+        )
         
     def start(self):
         """Start the scheduler"""
@@ -17,6 +26,7 @@ class QuoteScheduler:
             self.daily_quote_job,
             CronTrigger(hour=0, minute=1, timezone='UTC'),
             id='daily_quote_fetch',
+            executor='blocking_db',
             replace_existing=True
         )
         
@@ -25,57 +35,50 @@ class QuoteScheduler:
             self.backup_quote_job,
             CronTrigger(hour=12, minute=1, timezone='UTC'),
             id='backup_quote_fetch',
+            executor='blocking_db',
             replace_existing=True
         )
         
         self.scheduler.start()
-        print("Quote scheduler started successfully")
+        logger.info("Quote scheduler started")
     
     def stop(self):
         """Stop the scheduler"""
         if self.scheduler.running:
             self.scheduler.shutdown()
-            print("Quote scheduler stopped")
+            logger.info("Quote scheduler stopped")
     
     def daily_quote_job(self):
         """Fetch and store daily quote"""
         try:
-            # Get database session
-            db = next(get_db())
-            
-            # Fetch and store quote
-            fetch_and_store_quote(db)
-            
-            print(f"Daily quote job completed: {datetime.now()}")
+            with job_lock("hrm:daily_quote_fetch") as acquired:
+                if not acquired:
+                    return  # another worker is fetching
+                with db_session() as db:
+                    # The lock only serialises workers; skip the APIs when
+                    # another worker (or a restart) already stored today's quote
+                    if ensure_today_quote(db):
+                        logger.info("Daily quote job completed")
+                    else:
+                        logger.debug("Today's quote already exists, daily job skipped")
             
-        except Exception as e:
-            print(f"Daily quote job failed: {e}")
-        finally:
-            if 'db' in locals():
-                db.close()
+        except Exception:
+            logger.exception("Daily quote job failed")
     
     def backup_quote_job(self):
         """Backup job in case morning job failed"""
         try:
-            db = next(get_db())
-            
-            # Check if today's quote exists
-            from services.quotes import _utc_midnight, DailyQuote
-            key = _utc_midnight(datetime.now())
-            
-            existing = db.query(DailyQuote).filter(DailyQuote.date_utc == key).first()
-            
-            if not existing:
-                print("No quote found for today, running backup job...")
-                fetch_and_store_quote(db)
-            else:
-                print("Today's quote already exists, backup job skipped")
+            with job_lock("hrm:backup_quote_fetch") as acquired, db_session() as db:
+                if not acquired:
+                    return  # another worker is handling it
+                # Only hits the APIs when today's quote is missing
+                if ensure_today_quote(db):
+                    logger.info("No quote found for today, backup job fetched one")
+                else:
+                    logger.debug("Today's quote already exists, backup job skipped")
                 
-        except Exception as e:
-            print(f"Backup quote job failed: {e}")
-        finally:
-            if 'db' in locals():
-                db.close()
+        except Exception:
+            logger.exception("Backup quote job failed")
 
 # Global scheduler instance
 quote_scheduler = QuoteScheduler()
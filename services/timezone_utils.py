@@ -1,10 +1,13 @@
-from datetime import datetime, timezone, timedelta
+import re
+from datetime import date, datetime, time, timezone, timedelta
+from functools import lru_cache
 from typing import Optional, Union
-import pytz
 
 # IST Timezone Constants
-IST = timezone(timedelta(hours=5, minutes=30))
-IST_PYTZ = pytz.timezone('Asia/Kolkata')
+IST_OFFSET = timedelta(hours=5, minutes=30)  # IST has no DST, so conversion is a fixed shift
+IST = timezone(IST_OFFSET)
+_ZERO = timedelta(0)
+_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}\Z')
 
 def utc_now() -> datetime:
     return datetime.now(timezone.utc).replace(tzinfo=None)
@@ -15,9 +18,9 @@ def ist_now() -> datetime:
 def utc_to_ist(utc_dt: Optional[datetime]) -> Optional[datetime]:
     if utc_dt is None:
         return None
-    if utc_dt.tzinfo is None:
-        utc_dt = utc_dt.replace(tzinfo=timezone.utc)
-    return utc_dt.astimezone(IST).replace(tzinfo=None)
+    if utc_dt.tzinfo is not None:
+        utc_dt = utc_dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return utc_dt + IST_OFFSET
 
 def ist_to_utc(ist_dt: Optional[datetime]) -> Optional[datetime]:
     if ist_dt is None:
@@ -26,18 +29,57 @@ def ist_to_utc(ist_dt: Optional[datetime]) -> Optional[datetime]:
         ist_dt = ist_dt.replace(tzinfo=IST)
     return ist_dt.astimezone(timezone.utc).replace(tzinfo=None)
 
+# Serializers call this for every datetime field of every row; attendance
+# and leave timestamps repeat a lot, so memoize the conversion.
+@lru_cache(maxsize=2048)
+def to_ist(dt, _IST=IST, _UTC=timezone.utc):
+    # Convert any datetime (naive=assumed UTC; aware=converted) to IST
+    # (zones bound as defaults: locals instead of global lookups)
+    if not dt:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=_UTC)
+    return dt.astimezone(_IST)
+
+def ensure_utc_naive(dt, _UTC=timezone.utc):
+    # Ensure DB writes are stored as naive UTC (consistent with existing code)
+    # Accepts naive (assumed UTC) or aware datetimes, or a "YYYY-MM-DD" string
+    # (an IST calendar date, stored as IST midnight in UTC); returns naive UTC
+    if isinstance(dt, datetime):
+        if dt.tzinfo is None:
+            # Already naive: assume UTC by convention
+            return dt
+        # Already UTC (the common case): just drop tzinfo
+        if dt.utcoffset() == _ZERO:
+            return dt.replace(tzinfo=None)
+        # Convert to UTC then drop tzinfo
+        return dt.astimezone(_UTC).replace(tzinfo=None)
+    if isinstance(dt, str) and _DATE_RE.match(dt):
+        return parse_ist_date_input(dt)
+    if dt is None:
+        return None
+    raise TypeError(f"Expected datetime or 'YYYY-MM-DD' string, got {dt!r}")
+
 # API Response Formatters (for JSON serialization)
+# Numeric fields via f-strings: much cheaper than strftime, which is kept only for %p
+def _date_str(ist_dt: datetime) -> str:
+    return f"{ist_dt.year:04d}-{ist_dt.month:02d}-{ist_dt.day:02d}"
+
+def _time_24h_str(ist_dt: datetime) -> str:
+    return f"{ist_dt.hour:02d}:{ist_dt.minute:02d}"
+
+def _datetime_str(ist_dt: datetime) -> str:
+    return f"{_date_str(ist_dt)} {_time_24h_str(ist_dt)}:{ist_dt.second:02d}"
+
 def format_ist_datetime(utc_dt: Optional[datetime]) -> Optional[str]:
     if utc_dt is None:
         return None
-    ist_dt = utc_to_ist(utc_dt)
-    return ist_dt.strftime("%Y-%m-%d %H:%M:%S")
+    return _datetime_str(utc_to_ist(utc_dt))
 
 def format_ist_date(utc_dt: Optional[datetime]) -> Optional[str]:
     if utc_dt is None:
         return None
-    ist_dt = utc_to_ist(utc_dt)
-    return ist_dt.strftime("%Y-%m-%d")
+    return _date_str(utc_to_ist(utc_dt))
 
 def format_ist_time_12h(utc_dt: Optional[datetime]) -> Optional[str]:
     if utc_dt is None:
@@ -46,17 +88,29 @@ def format_ist_time_12h(utc_dt: Optional[datetime]) -> Optional[str]:
     return ist_dt.strftime("%I:%M %p")
 
 def format_ist_time_24h(utc_dt: Optional[datetime]) -> Optional[str]:
+    if utc_dt is None:
+        return None
+    return _time_24h_str(utc_to_ist(utc_dt))
+
+def format_ist_bundle(utc_dt: Optional[datetime]) -> Optional[dict]:
+    """All four IST strings from a single conversion, for rows that need several"""
     if utc_dt is None:
         return None
     ist_dt = utc_to_ist(utc_dt)
-    return ist_dt.strftime("%H:%M")
+    return {
+        "datetime": _datetime_str(ist_dt),
+        "date": _date_str(ist_dt),
+        "time_12h": ist_dt.strftime("%I:%M %p"),
+        "time_24h": _time_24h_str(ist_dt),
+    }
 
 # Input Parsers (for API requests)
 def parse_ist_datetime_input(ist_string: str) -> datetime:
     try:
-        # Parse IST time from user input
-        ist_dt = datetime.strptime(ist_string, "%Y-%m-%d %H:%M:%S")
-        ist_dt = ist_dt.replace(tzinfo=IST)
+        # Parse IST time from user input (fromisoformat: much cheaper than strptime)
+        ist_dt = datetime.fromisoformat(ist_string)
+        if ist_dt.tzinfo is None:
+            ist_dt = ist_dt.replace(tzinfo=IST)
         # Convert to UTC naive for database
         return ist_dt.astimezone(timezone.utc).replace(tzinfo=None)
     except ValueError as e:
@@ -65,8 +119,7 @@ def parse_ist_datetime_input(ist_string: str) -> datetime:
 def parse_ist_date_input(ist_date_string: str) -> datetime:
     try:
         # Parse IST date and assume midnight
-        ist_dt = datetime.strptime(ist_date_string, "%Y-%m-%d")
-        ist_dt = ist_dt.replace(tzinfo=IST)
+        ist_dt = datetime.combine(date.fromisoformat(ist_date_string), time.min, tzinfo=IST)
         # Convert to UTC for database
         return ist_dt.astimezone(timezone.utc).replace(tzinfo=None)
     except ValueError as e:
@@ -90,14 +143,14 @@ def debug_timezone_info(utc_dt: Optional[datetime]) -> dict:
     if utc_dt is None:
         return {"error": "None datetime provided"}
     
-    ist_dt = utc_to_ist(utc_dt)
+    ist = format_ist_bundle(utc_dt)
     return {
         "utc_input": utc_dt.isoformat() if utc_dt.tzinfo else f"{utc_dt.isoformat()} (naive)",
-        "ist_converted": ist_dt.isoformat(),
-        "ist_formatted": format_ist_datetime(utc_dt),
-        "ist_date": format_ist_date(utc_dt),
-        "ist_time_12h": format_ist_time_12h(utc_dt),
-        "ist_time_24h": format_ist_time_24h(utc_dt)
+        "ist_converted": utc_to_ist(utc_dt).isoformat(),
+        "ist_formatted": ist["datetime"],
+        "ist_date": ist["date"],
+        "ist_time_12h": ist["time_12h"],
+        "ist_time_24h": ist["time_24h"]
     }
 
 
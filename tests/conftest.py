@@ -0,0 +1,75 @@
+import os
+import pytest
+
+os.environ.setdefault("HRM_FAST_HASH", "1")  # before main/auth are imported
+# Tests run against a throwaway in-memory SQLite DB (db.py pools it on one
+# connection) unless TEST_DATABASE_URL points them at a real server
+os.environ["MSSQL_DB_URL"] = os.getenv("TEST_DATABASE_URL", "sqlite+pysqlite:///:memory:")
+
+# Under pytest-xdist (pytest -n auto) workers may share a TEST_DATABASE_URL
+# server; suffix usernames so parallel workers never collide on /register
+WORKER_ID = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+
+STUB_QUOTE = ("The only way to do great work is to love what you do.", "Steve Jobs")
+
+
+@pytest.fixture(scope="session")
+def client():
+    # One client (and one app startup/shutdown) for the whole run; imported here
+    # so tests that never touch the app don't pay for it
+    from fastapi.testclient import TestClient
+    from main import app
+    # /inspiration/today fetches from third-party quote APIs when today's quote is
+    # missing (always, on a fresh DB); serve a canned quote instead of the network.
+    # Tests marked integration call the real APIs.
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("services.quotes.fetch_quote_from_api", lambda api_config: STUB_QUOTE)
+        with TestClient(app) as c:
+            yield c
+
+
+@pytest.fixture(scope="session")
+def worker_username():
+    return lambda base: f"{base}_{WORKER_ID}"
+
+
+@pytest.fixture(scope="session")
+def seeded_employee(client, worker_username):
+    """(username, employee_id) of a User + Employee written straight through the ORM
+
+    Depends on client so the app (and its create_all) is up first.
+    """
+    from auth import hash_password
+    from db import db_session
+    from models import Employee, User
+    from services.leave_coins import grant_coins
+    username = worker_username("e2e_employee")
+    with db_session() as db:
+        user = db.query(User).filter(User.username == username).first()
+        if user is None:
+            user = User(username=username, hashed_password=hash_password("Pwd#E2e123"), role="employee")
+            db.add(user)
+            db.flush()
+        employee = db.query(Employee).filter(Employee.user_id == user.id).first()
+        if employee is None:
+            employee = Employee(name=username, user_id=user.id)
+            db.add(employee)
+            db.flush()
+        # Coins for the leave tests; grant_coins tops up to the cap, so reruns on a
+        # persistent TEST_DATABASE_URL don't accumulate
+        grant_coins(db, employee.id, amount=5, source="test_seed")
+        return username, employee.id
+
+
+@pytest.fixture(scope="session")
+def employee_auth(seeded_employee):
+    # Mint the JWT directly; the register/login HTTP path has its own test
+    from auth import create_access_token
+    username, _ = seeded_employee
+    token = create_access_token(data={"sub": username, "role": "employee"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(scope="session")
+def employee_id(seeded_employee):
+    return seeded_employee[1]
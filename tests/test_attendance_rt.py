@@ -1,14 +1,7 @@
-from fastapi.testclient import TestClient
-from main import app
-client = TestClient(app)
+from datetime import datetime, timedelta
 
-def auth(un, pw):
-    client.post("/register", json={"username": un, "password": pw, "role": "employee"})
-    t = client.post("/token", data={"username": un, "password": pw}).json()["access_token"]
-    return {"Authorization": f"Bearer {t}"}
-
-def test_rt_flow():
-    headers = auth("rt_user", "Pwd#Rt123")
+def test_rt_flow(client, employee_auth):
+    headers = employee_auth
     # Baseline: no active session
     r = client.get("/attendance-rt/active", headers=headers)
     assert r.status_code == 200
@@ -34,3 +27,59 @@ def test_rt_flow():
     assert r.status_code == 200
     rows = r.json()
     assert isinstance(rows, list)
+
+
+def test_rt_batch(client, employee_auth):
+    headers = employee_auth
+    r = client.get("/attendance-rt/active", headers=headers)
+    assert r.json()["session_id"] is None
+    # Clock-in, break, clock-out in one batch
+    ops = ["clock-in", "start-break", "stop-break", "clock-out"]
+    r = client.post("/attendance-rt/batch", headers=headers, json=[{"op": op} for op in ops])
+    assert r.status_code == 200, r.text
+    results = r.json()
+    assert [res["status"] for res in results] == ["active", "break", "active", "ended"]
+    sid = results[0]["session_id"]
+    assert all(res["session_id"] == sid for res in results)
+
+
+def test_rt_batch_failure_rolls_back(client, employee_auth):
+    headers = employee_auth
+    # stop-break with no break in progress fails after clock-in already ran
+    r = client.post("/attendance-rt/batch", headers=headers, json=[{"op": "clock-in"}, {"op": "stop-break"}])
+    assert r.status_code == 400
+    assert "Action 1 (stop-break)" in r.json()["detail"]
+    # The clock-in went with it
+    r = client.get("/attendance-rt/active", headers=headers)
+    assert r.status_code == 200
+    assert r.json()["session_id"] is None
+
+
+def test_break_totals_are_exact(client, employee_id):
+    from db import SessionLocal
+    from models import BreakInterval, WorkSession
+    from services.attendance_rt import _sum_breaks, sum_breaks_by_session
+
+    base = datetime(2025, 1, 6, 4, 0, 0, 123456)
+    db = SessionLocal()
+    try:
+        ws = WorkSession(employee_id=employee_id, clock_in_time=base, clock_out_time=base + timedelta(hours=9),
+                         status="ended", total_work_seconds=0)
+        db.add(ws)
+        db.flush()
+        # Sub-second offsets on both ends: each interval truncates like int(total_seconds())
+        durations = [timedelta(seconds=300), timedelta(seconds=59, microseconds=999999),
+                     timedelta(minutes=7, microseconds=1), timedelta(milliseconds=999)]
+        durations *= 50
+        expected = 0
+        for i, duration in enumerate(durations):
+            start = base + timedelta(minutes=2 * i, microseconds=7919 * i)
+            db.add(BreakInterval(session_id=ws.id, start_time=start, end_time=start + duration))
+            expected += int(duration.total_seconds())
+        db.flush()
+
+        assert _sum_breaks(db, ws.id) == expected
+        assert sum_breaks_by_session(db, [ws.id]) == {ws.id: expected}
+    finally:
+        db.rollback()
+        db.close()
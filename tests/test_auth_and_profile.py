@@ -1,10 +1,6 @@
-from fastapi.testclient import TestClient
-from main import app
-client = TestClient(app)
-
-def test_register_and_login_and_me():
+def test_register_and_login_and_me(client, worker_username):
     # Register a fresh user
-    uname = "e2e_user"
+    uname = worker_username("e2e_user")
     pwd = "e2e_pass123"
     r = client.post("/register", json={"username": uname, "password": pwd, "role": "employee"})
     assert r.status_code in (200, 400)  # 400 if already registered
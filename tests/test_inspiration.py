@@ -1,14 +1,17 @@
-from fastapi.testclient import TestClient
-from main import app
-client = TestClient(app)
-
-def test_inspiration_today():
-    # Reuse an auth token from a quick register/login
-    uname = "insp_user"
-    pwd = "xYz!1234"
-    client.post("/register", json={"username": uname, "password": pwd, "role": "employee"})
-    tok = client.post("/token", data={"username": uname, "password": pwd}).json()["access_token"]
-    r = client.get("/inspiration/today", headers={"Authorization": f"Bearer {tok}"})
+import pytest
+from services.quotes import QUOTE_APIS, fetch_quote_from_api, validate_quote_quality
+
+
+def test_inspiration_today(client, employee_auth):
+    r = client.get("/inspiration/today", headers=employee_auth)
     assert r.status_code == 200
     data = r.json()
     assert "text" in data and "author" in data
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("api_config", QUOTE_APIS, ids=lambda api: api["type"])
+def test_quote_api_live(api_config):
+    # Bound at import, before the client fixture stubs services.quotes for the app
+    text, author = fetch_quote_from_api(api_config)
+    assert validate_quote_quality(text, author), (text, author)
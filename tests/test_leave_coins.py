@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+
+# Fixed clock for the consume/expire tests; real "now" only matters for the cached balance
+NOW = datetime(2025, 6, 1, 9, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def coin_db(client, worker_username):
+    """(session, employee_id) for a throwaway employee whose coins and txns are removed afterwards"""
+    from db import SessionLocal
+    from models import Employee, LeaveCoin, LeaveCoinTxn, User
+    from services.leave_coins import _invalidate_balance
+    db = SessionLocal()
+    user = User(username=worker_username("coin_test"), hashed_password="x", role="employee")
+    db.add(user)
+    db.flush()
+    employee = Employee(name=user.username, user_id=user.id)
+    db.add(employee)
+    db.commit()
+    employee_id = employee.id
+    try:
+        yield db, employee_id
+    finally:
+        db.rollback()
+        db.query(LeaveCoinTxn).filter(LeaveCoinTxn.employee_id == employee_id).delete(synchronize_session=False)
+        db.query(LeaveCoin).filter(LeaveCoin.employee_id == employee_id).delete(synchronize_session=False)
+        db.delete(employee)
+        db.delete(user)
+        db.commit()
+        db.close()
+        # SQLite hands the next employee the same id; don't let it inherit a cached balance
+        _invalidate_balance(employee_id)
+
+
+def _add_coin(db, employee_id, grant_date, remaining):
+    from models import LeaveCoin
+    from services.leave_coins import _expiry_from_grant
+    grant_date = grant_date.replace(tzinfo=None)
+    coin = LeaveCoin(employee_id=employee_id, grant_date=grant_date, expiry_date=_expiry_from_grant(grant_date),
+                     quantity=remaining, remaining=remaining, source="test")
+    db.add(coin)
+    db.flush()
+    return coin
+
+
+def _txns(db, employee_id, type_):
+    from models import LeaveCoinTxn
+    return (
+        db.query(LeaveCoinTxn.coin_id, LeaveCoinTxn.amount)
+        .filter(LeaveCoinTxn.employee_id == employee_id, LeaveCoinTxn.type == type_)
+        .order_by(LeaveCoinTxn.id)
+        .all()
+    )
+
+
+def test_consume_is_fifo_by_expiry(coin_db):
+    from services.leave_coins import consume_coins
+    db, employee_id = coin_db
+    # Inserted out of expiry order; the middle-expiry coin must be used second
+    first = _add_coin(db, employee_id, NOW - timedelta(days=150), 2)
+    third = _add_coin(db, employee_id, NOW - timedelta(days=30), 3)
+    second = _add_coin(db, employee_id, NOW - timedelta(days=90), 1)
+    untouched = _add_coin(db, employee_id, NOW - timedelta(days=10), 4)
+
+    assert consume_coins(db, employee_id, 4, now=NOW) == 4
+    db.expire_all()
+    assert [c.remaining for c in (first, second, third, untouched)] == [0, 0, 2, 4]
+    assert _txns(db, employee_id, "consume") == [(first.id, 2), (second.id, 1), (third.id, 1)]
+
+
+def test_consume_insufficient_writes_nothing(coin_db):
+    from services.leave_coins import consume_coins
+    db, employee_id = coin_db
+    coin = _add_coin(db, employee_id, NOW - timedelta(days=30), 2)
+    # Already-expired coins never count towards the balance
+    _add_coin(db, employee_id, NOW - timedelta(days=400), 5)
+
+    assert consume_coins(db, employee_id, 3, now=NOW) == 0
+    db.expire_all()
+    assert coin.remaining == 2
+    assert _txns(db, employee_id, "consume") == []
+
+
+def test_expire_zeroes_rows_and_logs_amounts(coin_db):
+    from services.leave_coins import expire_coins
+    db, employee_id = coin_db
+    old = _add_coin(db, employee_id, NOW - timedelta(days=400), 2)
+    older = _add_coin(db, employee_id, NOW - timedelta(days=500), 1)
+    spent = _add_coin(db, employee_id, NOW - timedelta(days=450), 0)
+    live = _add_coin(db, employee_id, NOW - timedelta(days=30), 4)
+
+    # Other tests' coins are granted at the real clock, so none of them expire at NOW
+    assert expire_coins(db, now=NOW) == 3
+    db.expire_all()
+    assert [c.remaining for c in (old, older, spent, live)] == [0, 0, 0, 4]
+    assert sorted(_txns(db, employee_id, "expire")) == sorted([(old.id, 2), (older.id, 1)])
+    # A second run finds nothing left to expire
+    assert expire_coins(db, now=NOW) == 0
+    assert len(_txns(db, employee_id, "expire")) == 2
+
+
+def test_cached_balance_is_dropped_after_consume_commits(coin_db):
+    from services.leave_coins import consume_coins, get_available_coins
+    from services.timezone_utils import utc_now
+    db, employee_id = coin_db
+    _add_coin(db, employee_id, utc_now() - timedelta(days=20), 3)
+    db.commit()
+    assert get_available_coins(db, employee_id, use_cache=True)["available_coins"] == 3
+
+    assert consume_coins(db, employee_id, 2) == 2
+    # Uncommitted: the cached display value stands, validation paths see the write
+    assert get_available_coins(db, employee_id, use_cache=True)["available_coins"] == 3
+    assert get_available_coins(db, employee_id)["available_coins"] == 1
+    db.commit()
+    assert get_available_coins(db, employee_id, use_cache=True)["available_coins"] == 1
+
+
+def test_rolled_back_consume_keeps_cached_balance(coin_db):
+    from services.leave_coins import consume_coins, get_available_coins
+    from services.timezone_utils import utc_now
+    db, employee_id = coin_db
+    _add_coin(db, employee_id, utc_now() - timedelta(days=20), 3)
+    db.commit()
+    cached = get_available_coins(db, employee_id, use_cache=True)
+
+    assert consume_coins(db, employee_id, 2) == 2
+    db.rollback()
+    db.commit()  # a later commit must not drop the entry for the rolled-back write
+    assert get_available_coins(db, employee_id, use_cache=True) is cached
+    assert get_available_coins(db, employee_id)["available_coins"] == 3
@@ -0,0 +1,9 @@
+import pytest
+
+SMOKE_ENDPOINTS = ["/users/me", "/inspiration/today", "/attendance-rt/active", "/leave-balance/me"]
+
+
+@pytest.mark.parametrize("path", SMOKE_ENDPOINTS)
+def test_employee_endpoints_respond(client, employee_auth, path):
+    r = client.get(path, headers=employee_auth)
+    assert r.status_code == 200, r.text
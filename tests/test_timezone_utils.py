@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from services.timezone_utils import (
+    format_ist_bundle, format_ist_date, format_ist_datetime, format_ist_time_12h,
+    format_ist_time_24h, ist_to_utc, utc_to_ist,
+)
+
+CASES = [
+    datetime(1970, 1, 1, 0, 0, 0),                             # epoch
+    datetime(2024, 2, 29, 18, 29, 59),                         # leap day, just before IST midnight
+    datetime(2024, 2, 29, 18, 30, 0),                          # IST midnight
+    datetime(2024, 3, 10, 7, 0, 0),                            # US DST start: IST has none
+    datetime(2024, 12, 31, 23, 59, 59),                        # year rollover in IST
+    datetime(2038, 1, 19, 3, 14, 8),                           # past the 32-bit time_t limit
+    datetime(2025, 6, 15, 6, 30, 0, tzinfo=timezone.utc),      # aware UTC
+    datetime(2025, 6, 15, 12, 0, 0, tzinfo=timezone(timedelta(hours=5, minutes=30))),  # aware IST
+]
+
+
+def _naive_utc(dt):
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+
+@pytest.mark.parametrize("dt", CASES)
+def test_ist_round_trip(dt):
+    ist = utc_to_ist(dt)
+    assert ist - _naive_utc(dt) == timedelta(hours=5, minutes=30)
+    assert ist_to_utc(ist) == _naive_utc(dt)
+
+
+@pytest.mark.parametrize("dt", CASES)
+def test_bundle_matches_single_formatters(dt):
+    bundle = format_ist_bundle(dt)
+    assert bundle == {
+        "datetime": format_ist_datetime(dt),
+        "date": format_ist_date(dt),
+        "time_12h": format_ist_time_12h(dt),
+        "time_24h": format_ist_time_24h(dt),
+    }
+    assert bundle["datetime"].startswith(bundle["date"])
+    assert bundle["datetime"][11:16] == bundle["time_24h"]
+    hour_24 = int(bundle["time_24h"][:2])
+    assert int(bundle["time_12h"][:2]) == (hour_24 % 12 or 12)
+    assert bundle["time_12h"].endswith("PM" if hour_24 >= 12 else "AM")
+
+
+def test_none_passes_through():
+    assert utc_to_ist(None) is None
+    assert format_ist_bundle(None) is None